@@ -1,49 +1,151 @@
 import asyncio
-import json
+import concurrent.futures
+import hashlib
+import orjson
+from collections import namedtuple
 from crawl4ai import AsyncWebCrawler
-from bs4 import BeautifulSoup
+from aiolimiter import AsyncLimiter
+import diskcache
+from lxml import etree
+from lxml.cssselect import CSSSelector
+import lxml.html
 import logging
 import os
+import re
 
 # Set up logging
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
 
-async def scrape_past_auctions(crawler, url):
-    """Scrapes all auction details from the past auctions page for 2015 onwards."""
-    try:
+# One parser shared by every page; blank text and comments are dropped while parsing
+_LXML_PARSER = lxml.html.HTMLParser(remove_blank_text=True, remove_comments=True, huge_tree=True, recover=True)
+
+# Selectors are compiled once to XPath here rather than on every page
+_PRICE_SEL = CSSSelector("div.field-price-sold")
+_YEAR_HEADING_SEL = CSSSelector("h3")
+_LOT_ROW_SEL = CSSSelector("div.views-row")
+_LINK_SEL = CSSSelector("a[href]")
+_LOT_LINK_SEL = CSSSelector('a[href*="/auction/lot/"]')
+_LOCATION_SEL = CSSSelector("div.field-name-field-auction-location div.field-item")
+_DATE_SEL = CSSSelector("div.field-name-field-auction-date span.date-display-single")
+_SALE_NUMBER_SEL = CSSSelector("div.field-name-field-auction-number div.field-item")
+_FOLLOWING_SIBLINGS = etree.XPath("following-sibling::*")
+
+# Lot pages are read with one XPath pass; each field div is recognised by its class token
+_FIELD_DIVS = etree.XPath("//div[contains(@class, 'field-')]")
+_LOT_FIELD_CLASSES = {
+    "field-name-field-lot-artist": "artist",
+    "field-lot-title": "title",
+    "field-name-field-lot-medium": "medium",
+    "field-name-field-lot-size": "size",
+    "field-name-field-lot-signed": "signed",
+    "field-name-field-lot-provenance": "provenance",
+    "field-name-field-lot-condition": "condition",
+    "field-price-sold": "price",
+}
+_LOT_PARAGRAPH_FIELDS = (
+    ("artist", "Unknown Artist"),
+    ("medium", "Unknown Medium"),
+    ("size", "Not specified"),
+    ("signed", "No signage found"),
+    ("provenance", "Not specified"),
+    ("condition", "Not specified"),
+)
+
+# Captures the amount in a "Sold for $1,234 (inc. BP)" price; text from "in" on is dropped
+_PRICE_RE = re.compile(r"(?i:Sold for)\s*(.*?)\s*(?:in|$)")
+
+# Global request rate shared by every fetch, allowing short bursts up to the limit
+_LIMITER = AsyncLimiter(max_rate=8, time_period=1.0)
+
+# Raw HTML of auction and lot pages keyed by URL hash, so a rerun reads them from disk
+_HTML_CACHE_DIR = ".html_cache"
+CachedResult = namedtuple("CachedResult", ["success", "html"])
+
+def first_match(selector, element):
+    """Returns the first element matched by a precompiled selector, or None."""
+    return (selector(element) or [None])[0]
+
+def element_text(element):
+    """Returns the element's text with each piece stripped, like BeautifulSoup's get_text(strip=True)."""
+    return "".join(text.strip() for text in element.itertext())
+
+async def fetch_page(crawler, url, sem, cache):
+    """Fetches a page through the on-disk HTML cache, going to the network only on a miss."""
+    key = hashlib.blake2b(url.encode(), digest_size=16).hexdigest()
+    html = cache.get(key)
+    if html is not None:
+        return CachedResult(success=True, html=html)
+
+    async with sem, _LIMITER:
         result = await crawler.arun(url=url)
+    if result.success:
+        cache[key] = result.html
+    return result
+
+def sold_price_text(price_div):
+    """Returns the price from a field-price-sold div, cut at the first "in" like the scraped text always was."""
+    text = element_text(price_div)
+    match = _PRICE_RE.search(text)
+    # Without a "Sold for" prefix the text before the first "in" is kept as the price
+    return match.group(1) if match else text.split("in")[0].strip()
+
+def find_lot_fields(root):
+    """Returns the first div of each lot field on the page, keyed by field name."""
+    fields = {}
+    for div in _FIELD_DIVS(root):
+        for token in div.get("class").split():
+            name = _LOT_FIELD_CLASSES.get(token)
+            if name and name not in fields:
+                fields[name] = div
+    return fields
+
+def paragraph_text(div, default):
+    """Returns the text of the first <p> inside a field div, or the default if there is none."""
+    p = div.find(".//p") if div is not None else None
+    return element_text(p) if p is not None else default
+
+async def scrape_past_auctions(crawler, url, existing_urls):
+    """Scrapes details of auctions from 2015 onwards on the past auctions page, skipping URLs in existing_urls."""
+    try:
+        async with _LIMITER:
+            result = await crawler.arun(url=url)
         if not result.success:
             logging.error(f"Failed to crawl {url}")
             return []
 
-        soup = BeautifulSoup(result.html, "html.parser")
+        root = lxml.html.fromstring(result.html, parser=_LXML_PARSER)
         auctions_data = []
-        year_headings = soup.select("h3")
+        year_headings = _YEAR_HEADING_SEL(root)
 
         for year_heading in year_headings:
-            year = year_heading.get_text(strip=True).strip()
+            year = element_text(year_heading)
             if year.isdigit() and int(year) <= 2014:
                 logging.info(f"Stopping at year {year}")
                 break
 
-            next_element = year_heading.find_next_sibling()
-            while next_element and next_element.name != "h3":
-                if next_element.get("class", []) and "views-row" in next_element["class"]:
-                    auction_link = next_element.find("a", href=True)
-                    if auction_link and "/auctions/past" not in auction_link["href"]:
-                        title = auction_link.get_text(strip=True)
-                        url = auction_link["href"]
+            for next_element in _FOLLOWING_SIBLINGS(year_heading):
+                if next_element.tag == "h3":
+                    break
+                if "views-row" in next_element.get("class", "").split():
+                    auction_link = first_match(_LINK_SEL, next_element)
+                    if auction_link is not None and "/auctions/past" not in auction_link.get("href"):
+                        url = auction_link.get("href")
                         if url.startswith("/"):
                             url = f"https://www.deutscherandhackett.com{url}"
+                        # Already scraped auctions are skipped before any more of the row is parsed
+                        if url in existing_urls:
+                            continue
+
+                        title = element_text(auction_link)
 
-                        location_div = next_element.find("div", class_="field-name-field-auction-location")
-                        location = location_div.find("div", class_="field-item").get_text(strip=True) if location_div else "No location found"
+                        location_item = first_match(_LOCATION_SEL, next_element)
+                        location = element_text(location_item) if location_item is not None else "No location found"
 
-                        date_div = next_element.find("div", class_="field-name-field-auction-date")
-                        date = date_div.find("span", class_="date-display-single").get_text(strip=True) if date_div else "No date found"
+                        date_span = first_match(_DATE_SEL, next_element)
+                        date = element_text(date_span) if date_span is not None else "No date found"
 
-                        sale_div = next_element.find("div", class_="field-name-field-auction-number")
-                        sale_number = sale_div.find("div", class_="field-item").get_text(strip=True) if sale_div else "No sale number found"
+                        sale_item = first_match(_SALE_NUMBER_SEL, next_element)
+                        sale_number = element_text(sale_item) if sale_item is not None else "No sale number found"
 
                         auctions_data.append({
                             "url": url,
@@ -55,99 +157,86 @@ async def scrape_past_auctions(crawler, url):
                             "lots": []
                         })
 
-                next_element = next_element.find_next_sibling()
-
         return auctions_data
 
     except Exception as e:
         logging.error(f"Error scraping {url}: {str(e)}")
         return []
 
-async def scrape_lot_details(crawler, lot_url):
-    """Scrapes details from an individual lot page."""
+def parse_lot(html, lot_url, auction_url):
+    """Extracts the lot fields from a lot page's HTML; runs in a worker process."""
+    root = lxml.html.fromstring(html, parser=_LXML_PARSER)
+
+    fields = find_lot_fields(root)
+    artist, medium, size, signed, provenance, condition = (
+        paragraph_text(fields.get(name), default) for name, default in _LOT_PARAGRAPH_FIELDS
+    )
+
+    title_div = fields.get("title")
+    artwork_title = element_text(title_div) if title_div is not None else "Unknown Title"
+
+    sold_price_div = fields.get("price")
+    sold_price = sold_price_text(sold_price_div) if sold_price_div is not None else None
+
+    if not sold_price:
+        logging.warning(f"No sold price found for lot: {lot_url}")
+        sold_price = "Price not found on lot page"
+
+    return {
+        "artist": artist,
+        "title": artwork_title,
+        "medium": medium,
+        "size": size,
+        "signage": signed,
+        "provenance": provenance,
+        "condition": condition,
+        "price": sold_price,
+        "url": lot_url,
+        "auctionUrl": auction_url
+    }
+
+async def scrape_lot_details(crawler, lot_url, auction_url, sem, cache, pool):
+    """Scrapes details from an individual lot page, fetching it through the page cache."""
     try:
         if lot_url.startswith("/"):
             lot_url = f"https://www.deutscherandhackett.com{lot_url}"
 
-        await asyncio.sleep(2)  # Increased delay to avoid rate-limiting
-        result = await crawler.arun(url=lot_url)  # Adjust js_execution if needed
+        result = await fetch_page(crawler, lot_url, sem, cache)
         if not result.success:
             logging.error(f"Failed to crawl lot page {lot_url}")
             return None
 
-        soup = BeautifulSoup(result.html, "html.parser")
-
-        artist_div = soup.find("div", class_="field-name-field-lot-artist")
-        artist = artist_div.find("p").get_text(strip=True) if artist_div and artist_div.find("p") else "Unknown Artist"
-
-        title_div = soup.find("div", class_="field-lot-title")
-        artwork_title = title_div.get_text(strip=True) if title_div else "Unknown Title"
-
-        medium_div = soup.find("div", class_="field-name-field-lot-medium")
-        medium = medium_div.find("p").get_text(strip=True) if medium_div and medium_div.find("p") else "Unknown Medium"
-
-        size_div = soup.find("div", class_="field-name-field-lot-size")
-        size = size_div.find("p").get_text(strip=True) if size_div and size_div.find("p") else "Not specified"
-
-        signed_div = soup.find("div", class_="field-name-field-lot-signed")
-        signed = signed_div.find("p").get_text(strip=True) if signed_div and signed_div.find("p") else "No signage found"
-
-        provenance_div = soup.find("div", class_="field-name-field-lot-provenance")
-        provenance = provenance_div.find("p").get_text(strip=True) if provenance_div and provenance_div.find("p") else "Not specified"
-
-        condition_div = soup.find("div", class_="field-name-field-lot-condition")
-        condition = condition_div.find("p").get_text(strip=True) if condition_div and condition_div.find("p") else "Not specified"
-
-        sold_price_div = soup.find("div", class_="field-price-sold")
-        sold_price = sold_price_div.get_text(strip=True).split("in")[0].replace("Sold for", "").strip() if sold_price_div else None
-
-        if not sold_price:
-            logging.warning(f"No sold price found for lot: {lot_url}")
-            sold_price = "Price not found on lot page"
-
-        return {
-            "artist": artist,
-            "title": artwork_title,
-            "medium": medium,
-            "size": size,
-            "signage": signed,
-            "provenance": provenance,
-            "condition": condition,
-            "price": sold_price,
-            "url": lot_url
-        }
+        # Parsing is CPU-bound, so it runs in the process pool and the event loop keeps fetching
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(pool, parse_lot, result.html, lot_url, auction_url)
 
     except Exception as e:
         logging.error(f"Error scraping lot details for {lot_url}: {str(e)}")
         return None
 
-async def scrape_auction_details(crawler, auction):
-    """Scrapes lot details from an auction page and follows sold lot links."""
+async def scrape_auction_details(crawler, auction, sem, cache, pool):
+    """Scrapes lot details from an auction page and follows sold lot links; returns (scraped, complete)."""
     try:
-        if auction["lots"]:
-            logging.info(f"Skipping already processed auction: {auction['url']}")
-            return True
-
-        result = await crawler.arun(url=auction["url"])
+        result = await fetch_page(crawler, auction["url"], sem, cache)
         if not result.success:
             logging.error(f"Failed to crawl auction page {auction['url']}")
-            return False
+            return False, False
 
-        soup = BeautifulSoup(result.html, "html.parser")
-        lot_rows = soup.select("div.views-row")
+        root = lxml.html.fromstring(result.html, parser=_LXML_PARSER)
+        lot_rows = _LOT_ROW_SEL(root)
         logging.info(f"Found {len(lot_rows)} total lots on page for auction: {auction['url']}")
 
         tasks = []
         sold_count = 0
         for row in lot_rows:
-            sold_price_div = row.find("div", class_="field-price-sold")
-            if sold_price_div:
+            sold_price_div = first_match(_PRICE_SEL, row)
+            if sold_price_div is not None:
                 sold_count += 1
-                lot_link = row.find("a", href=lambda h: h and "/auction/lot/" in h)
-                if lot_link:
-                    tasks.append(scrape_lot_details(crawler, lot_link["href"]))
+                lot_link = first_match(_LOT_LINK_SEL, row)
+                if lot_link is not None:
+                    tasks.append(scrape_lot_details(crawler, lot_link.get("href"), auction["url"], sem, cache, pool))
                 else:
-                    sold_price = sold_price_div.get_text(strip=True).split("in")[0].replace("Sold for", "").strip()
+                    sold_price = sold_price_text(sold_price_div)
                     logging.warning(f"Sold item found but no lot link in row for auction: {auction['url']}, recording price: {sold_price}")
                     auction["lots"].append({
                         "price": sold_price,
@@ -157,49 +246,88 @@ async def scrape_auction_details(crawler, auction):
         logging.info(f"Identified {sold_count} sold lots for auction: {auction['url']}")
 
         lot_details = await asyncio.gather(*tasks)
-        auction["lots"].extend([
-            {**lot, "auctionUrl": auction["url"]}
-            for lot in lot_details if lot is not None
-        ])
+        auction["lots"].extend(lot for lot in lot_details if lot is not None)
         logging.info(f"Scraped {len(auction['lots'])} lots for auction: {auction['url']}")
-        if sold_count != len(auction["lots"]):
+        # An auction is complete only when every sold lot was scraped; otherwise it is retried on the next run
+        complete = sold_count == len(auction["lots"])
+        if not complete:
             logging.warning(f"Mismatch: Identified {sold_count} sold lots, but only scraped {len(auction['lots'])}")
-        return True
+        return True, complete
 
     except Exception as e:
         logging.error(f"Error scraping auction details for {auction['url']}: {str(e)}")
-        return False
-
-def save_progress(auctions_data, filename="auctions_with_lots.json"):
-    """Saves the current state of auctions_data to a JSON file."""
-    with open(filename, "w", encoding="utf-8") as f:
-        json.dump(auctions_data, f, indent=4)
-    logging.info(f"Progress saved to {filename}")
+        return False, False
+
+def iter_urls(path):
+    """Yields the auction URL of each line in the JSON Lines output without decoding the rest of the line."""
+    with open(path, "rb") as f:
+        for line in f:
+            # "url" is the first key of every auction, so the first match is the auction's own URL
+            start = line.find(b'"url":"')
+            if start == -1:
+                continue
+            start += len(b'"url":"')
+            yield line[start:line.find(b'"', start)].decode()
+
+def save_auction(out, auction):
+    """Appends a completed auction as one compact line to the JSON Lines output file."""
+    out.write(orjson.dumps(auction) + b"\n")
+    out.flush()
+    logging.info(f"Saved auction {auction['url']} to {out.name}")
+
+def migrate_legacy_output(legacy_file, output_file):
+    """Writes the finished auctions of the old JSON array dump to a new JSON Lines output file."""
+    with open(legacy_file, "rb") as f:
+        auctions = orjson.loads(f.read())
+    # The old scraper rescraped auctions with no lots, so only those with lots count as finished
+    finished = [auction for auction in auctions if auction.get("lots")]
+
+    # Written under a temporary name first, so an interrupted migration is simply redone
+    tmp_file = f"{output_file}.tmp"
+    with open(tmp_file, "wb") as out:
+        for auction in finished:
+            out.write(orjson.dumps(auction) + b"\n")
+    os.replace(tmp_file, output_file)
+    logging.info(f"Migrated {len(finished)} finished auctions from {legacy_file} to {output_file}")
 
 async def main():
     base_url = "https://www.deutscherandhackett.com/auctions/past"
-    output_file = "auctions_with_lots.json"
+    output_file = "auctions_with_lots.jsonl"
+    legacy_file = "auctions_with_lots.json"
 
     async with AsyncWebCrawler() as crawler:
-        # Load existing data if available, otherwise scrape auction list
+        # Auctions finished by the old scraper are carried over once, so they are not scraped again
+        if not os.path.exists(output_file) and os.path.exists(legacy_file):
+            migrate_legacy_output(legacy_file, output_file)
+
+        # Auctions already in the output file are complete and are not scraped again
+        existing_urls = set()
         if os.path.exists(output_file):
-            with open(output_file, "r", encoding="utf-8") as f:
-                auctions_data = json.load(f)
-            logging.info(f"Loaded existing data with {len(auctions_data)} auctions from {output_file}")
-        else:
-            auctions_data = await scrape_past_auctions(crawler, base_url)
-            logging.info(f"Scraped {len(auctions_data)} auctions from {base_url}")
-            save_progress(auctions_data)
-
-        # Process each auction
-        completed_auctions = 0
-        for auction in auctions_data:
-            success = await scrape_auction_details(crawler, auction)
-            if success:
-                completed_auctions += 1
-            save_progress(auctions_data)  # Save after each auction for progress tracking
-
-        logging.info(f"Scraping complete. Processed {completed_auctions} out of {len(auctions_data)} auctions. Final data saved in {output_file}")
+            existing_urls = set(iter_urls(output_file))
+            logging.info(f"Loaded {len(existing_urls)} completed auction URLs from {output_file}")
+
+        new_auctions = await scrape_past_auctions(crawler, base_url, existing_urls)
+        logging.info(f"Scraped {len(new_auctions)} new auctions from {base_url}")
+
+        # The page cache and the worker processes that parse lot pages off the event loop live for this run only
+        with open(output_file, "ab") as out, diskcache.Cache(_HTML_CACHE_DIR) as cache, \
+                concurrent.futures.ProcessPoolExecutor(max_workers=os.cpu_count()) as pool:
+            def save_if_complete(task, auction):
+                # Failed or partly scraped auctions are not written, so the next run retries them
+                _, complete = task.result()
+                if complete:
+                    save_auction(out, auction)
+
+            # Process all auctions concurrently; the semaphore bounds in-flight page fetches
+            sem = asyncio.Semaphore(16)
+            tasks = [asyncio.ensure_future(scrape_auction_details(crawler, auction, sem, cache, pool)) for auction in new_auctions]
+            for auction, task in zip(new_auctions, tasks):
+                task.add_done_callback(lambda t, auction=auction: save_if_complete(t, auction))
+            results = await asyncio.gather(*tasks)
+            completed_auctions = sum(success for success, _ in results)
+            saved_auctions = sum(complete for _, complete in results)
+
+        logging.info(f"Scraping complete. Processed {completed_auctions} out of {len(new_auctions)} new auctions, saved {saved_auctions} complete ones. Final data saved in {output_file}")
 
 if __name__ == "__main__":
     asyncio.run(main())
\ No newline at end of file
@@ -1,49 +1,393 @@
 import json
-import csv
+import contextlib
+import gzip
+import io
 import logging
+import mmap
+import multiprocessing
 import os
+import re
+import shutil
+import sys
+
+try:
+    import orjson
+except ImportError:  # orjson is optional; the stdlib json module is used without it
+    orjson = None
+
+try:
+    import ijson
+except ImportError:  # ijson is optional; legacy JSON arrays are then parsed whole
+    ijson = None
+
+try:
+    import simdjson
+except ImportError:  # pysimdjson is optional; the stdlib parser is used without it
+    simdjson = None
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pa_compute
+    import pyarrow.csv as pa_csv
+    import pyarrow.parquet as pq
+except ImportError:  # pyarrow is optional; only json_to_parquet and the pyarrow CSV engine need it
+    pa = None
+
+try:
+    import zstandard
+except ImportError:  # zstandard is optional; only .zst output from the python engine needs it
+    zstandard = None
+
+try:
+    import json_to_csv_core
+except ImportError:  # the Cython row formatter is optional; build it with `cythonize -i -3 json_to_csv_core.pyx`
+    json_to_csv_core = None
 
 # Set up logging
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
 
-def json_to_csv(json_filename="auctions_with_lots.json", csv_filename="auctions_with_lots.csv"):
-    """Converts the JSON data from auctions to a CSV file."""
+# Read and write in large blocks to cut syscalls on multi-hundred-MB dumps
+_IO_BUFFER_SIZE = 4 * 1024 * 1024
+
+# JSON inputs up to this size have all their rows formatted in one pass and written in one call
+_SINGLE_WRITE_MAX_BYTES = 32 * 1024 * 1024
+
+# Fastest available decoder for one JSON document
+_json_loads = orjson.loads if orjson is not None else json.loads
+
+# One simdjson parser reused across calls so its internal buffers are recycled
+_SIMDJSON_PARSER = simdjson.Parser() if simdjson is not None else None
+
+# Output fields: auction-level fields are repeated on every lot row
+AUCTION_FIELDS = ("url", "title", "year", "location", "date", "sale_number")
+LOT_FIELDS = ("artist", "title", "medium", "size", "signage", "provenance", "condition", "price", "url", "auctionUrl")
+CSV_HEADERS = AUCTION_FIELDS + LOT_FIELDS
+_YEAR_COLUMN = CSV_HEADERS.index("year")
+
+# Auction columns named like a lot column ("url", "title") hold the lot's value in the CSV
+_SHARED_COLUMNS = tuple((i, LOT_FIELDS.index(field)) for i, field in enumerate(AUCTION_FIELDS) if field in LOT_FIELDS)
+
+# The number in a scraped price such as "$58,909 ("
+_PRICE_NUMBER_RE = re.compile(r"\d[\d,]*(?:\.\d+)?")
+
+def is_json_lines(f):
+    """Sniffs an open binary file and rewinds it: a legacy dump starts with "[", anything else is JSON Lines."""
+    first_byte = f.read(1)
+    while first_byte.isspace():
+        first_byte = f.read(1)
+    f.seek(0)
+    return first_byte != b"["
+
+def open_json(json_filename):
+    """Opens the scraped auctions for buffered binary reading, or logs an error and returns None if the file is missing."""
     try:
-        # Check if JSON file exists
-        if not os.path.exists(json_filename):
-            logging.error(f"JSON file {json_filename} not found.")
-            return
+        return open(json_filename, "rb", buffering=_IO_BUFFER_SIZE)
+    except FileNotFoundError:
+        pass
+
+    # Checkouts made before the JSON Lines output only have the legacy .json dump, which iter_auctions also reads
+    if json_filename.endswith(".jsonl"):
+        legacy_filename = json_filename[:-1]
+        try:
+            json_file = open(legacy_filename, "rb", buffering=_IO_BUFFER_SIZE)
+        except FileNotFoundError:
+            pass
+        else:
+            logging.info(f"JSON file {json_filename} not found, reading {legacy_filename} instead.")
+            return json_file
+
+    logging.error(f"JSON file {json_filename} not found.")
+    return None
+
+def iter_auctions(f):
+    """Yields auctions one at a time from an open binary file holding JSON Lines or one legacy JSON array."""
+    if is_json_lines(f):
+        for line in f:
+            if line.strip():
+                yield _json_loads(line)
+    elif ijson is not None:
+        yield from ijson.items(f, "item")
+    else:
+        # The file is mapped rather than read, so the OS pages it in on demand instead of copying it into a bytes object
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            if _SIMDJSON_PARSER is not None:
+                # simdjson parses lazily, so only the fields written to the CSV are materialised
+                yield from _SIMDJSON_PARSER.parse(mm)
+            elif orjson is not None:
+                yield from orjson.loads(memoryview(mm))
+            else:
+                yield from json.loads(bytes(mm))
+
+def iter_json_lines_range(json_filename, start, end):
+    """Yields the auctions on the JSON Lines records that start between two byte offsets."""
+    with open(json_filename, "rb", buffering=_IO_BUFFER_SIZE) as f:
+        f.seek(start)
+        while f.tell() < end:
+            line = f.readline()
+            if line.strip():
+                yield _json_loads(line)
+
+def json_lines_ranges(json_filename, parts):
+    """Splits a JSON Lines file into up to `parts` byte ranges that each start on a line boundary."""
+    size = os.path.getsize(json_filename)
+    offsets = [0]
+    with open(json_filename, "rb") as f:
+        for i in range(1, parts):
+            f.seek(size * i // parts)
+            f.readline()
+            if offsets[-1] < f.tell() < size:
+                offsets.append(f.tell())
+    offsets.append(size)
+    return list(zip(offsets, offsets[1:]))
+
+def auction_rows(auction):
+    """Returns one CSV row per lot of an auction, with values in CSV_HEADERS order."""
+    # Bound .get methods skip an attribute lookup for every field
+    get_auction_field = auction.get
+    # Auctions without lots produce no rows, so skip building their values
+    lots = get_auction_field("lots")
+    if not lots:
+        return []
+
+    auction_values = [get_auction_field(field, "") for field in AUCTION_FIELDS]
+    rows = []
+    for lot in lots:
+        get_lot_field = lot.get
+        lot_values = [get_lot_field(field, "") for field in LOT_FIELDS]
+        # Combine auction-level and lot-level values in header order
+        row = auction_values + lot_values
+        for auction_index, lot_index in _SHARED_COLUMNS:
+            row[auction_index] = lot_values[lot_index]
+        rows.append(row)
+    return rows
+
+def escape_csv_value(value):
+    """Returns a value as CSV text, quoted only when it contains a comma, quote or line break."""
+    text = "" if value is None else str(value)
+    # Four substring tests run in C and beat a regex search on the short values scraped here; this
+    # quotes the same characters as csv.QUOTE_MINIMAL
+    if '"' in text or "," in text or "\n" in text or "\r" in text:
+        return '"' + text.replace('"', '""') + '"'
+    return text
+
+def _format_csv_rows_py(rows):
+    """Formats rows as CSV lines ending in CRLF, like the csv module's default dialect."""
+    return "".join(",".join(map(escape_csv_value, row)) + "\r\n" for row in rows)
+
+# The compiled formatter, when built, produces the same text without a Python call per value
+format_csv_rows = json_to_csv_core.format_csv_rows if json_to_csv_core is not None else _format_csv_rows_py
+
+def csv_schema():
+    """Returns the Arrow schema of the CSV columns: year as int32, every other column as string."""
+    return pa.schema([(header, pa.int32() if i == _YEAR_COLUMN else pa.string()) for i, header in enumerate(CSV_HEADERS)])
+
+def string_array(column):
+    """Builds an Arrow string array from one column, converting non-string values with str() like the python engine."""
+    try:
+        return pa.array(column, type=pa.string())
+    except (pa.ArrowTypeError, pa.ArrowInvalid):
+        # Scraped values are strings, so the conversion pass only runs for columns holding other JSON types
+        return pa.array([None if value is None else str(value) for value in column], type=pa.string())
+
+def rows_to_table(rows, schema):
+    """Transposes a batch of CSV rows into an Arrow table with the given CSV schema."""
+    arrays = [string_array(column) for column in zip(*rows)]
+    # Years are cast to int32 inside Arrow, so its writer formats them natively; non-numeric years become empty
+    years = arrays[_YEAR_COLUMN]
+    arrays[_YEAR_COLUMN] = pa_compute.if_else(pa_compute.utf8_is_digit(years), years, None).cast(pa.int32())
+    return pa.Table.from_arrays(arrays, schema=schema)
+
+def open_csv_output(csv_filename):
+    """Opens the CSV output for text writing, compressed with zstd or gzip when its name ends in .zst or .gz."""
+    if csv_filename.endswith(".zst"):
+        # The compressor runs on its own threads, alongside the formatting loop
+        raw = open(csv_filename, "wb", buffering=_IO_BUFFER_SIZE)
+        stream = zstandard.ZstdCompressor(level=3, threads=-1).stream_writer(raw)
+        return io.TextIOWrapper(stream, encoding="utf-8", newline="")
+    if csv_filename.endswith(".gz"):
+        # The lowest level keeps gzip cheap; zstd compresses better for the same time
+        return gzip.open(csv_filename, "wt", compresslevel=1, encoding="utf-8", newline="")
+    return open(csv_filename, "w", newline="", encoding="utf-8", buffering=_IO_BUFFER_SIZE)
+
+def arrow_compression(csv_filename):
+    """Returns the Arrow codec for a compressed CSV filename, or None for plain CSV."""
+    if csv_filename.endswith(".zst"):
+        return "zstd"
+    if csv_filename.endswith(".gz"):
+        return "gzip"
+    return None
+
+def write_auctions(auctions, write_batch, chunksize):
+    """Writes the rows of each auction through write_batch in chunks; returns the auction and lot counts."""
+    total_auctions = 0
+    total_lots = 0
+    batch = []
+    for auction in auctions:
+        total_auctions += 1
+        batch.extend(auction_rows(auction))
+
+        # Larger chunks trade memory for fewer writer calls
+        if len(batch) >= chunksize:
+            write_batch(batch)
+            total_lots += len(batch)
+            batch.clear()
+
+    if batch:
+        write_batch(batch)
+        total_lots += len(batch)
+    return total_auctions, total_lots
 
-        # Load JSON data
-        with open(json_filename, "r", encoding="utf-8") as f:
-            auctions_data = json.load(f)
-        logging.info(f"Loaded JSON data with {len(auctions_data)} auctions from {json_filename}")
+def write_csv_part(json_filename, start, end, part_filename, chunksize):
+    """Writes the rows of one byte range of a JSON Lines file to a headerless CSV part; runs in a worker process."""
+    with open(part_filename, "w", newline="", encoding="utf-8", buffering=_IO_BUFFER_SIZE) as part:
+        auctions = iter_json_lines_range(json_filename, start, end)
+        return write_auctions(auctions, lambda batch: part.write(format_csv_rows(batch)), chunksize)
 
-        # Define CSV headers (auction-level + lot-level fields)
-        auction_fields = ["url", "title", "year", "location", "date", "sale_number"]
-        lot_fields = ["artist", "title", "medium", "size", "signage", "provenance", "condition", "price", "url", "auctionUrl"]
-        headers = auction_fields + lot_fields
+def json_to_csv(json_filename="auctions_with_lots.jsonl", csv_filename="auctions_with_lots.csv", chunksize=None, engine="python", workers=1):
+    """Converts the scraped auctions to a CSV file, streaming one auction at a time and writing rows in chunks."""
+    if engine not in ("python", "pyarrow"):
+        logging.error(f"Unknown CSV engine {engine!r}; use \"python\" or \"pyarrow\".")
+        return
+    if engine == "pyarrow" and pa is None:
+        logging.error("pyarrow is required for the pyarrow CSV engine.")
+        return
+    if engine == "python" and csv_filename.endswith(".zst") and zstandard is None:
+        logging.error("zstandard is required to write .zst output.")
+        return
+
+    try:
+        # A missing file is reported by open itself rather than by a separate existence check
+        json_file = open_json(json_filename)
+        if json_file is None:
+            return
+        json_filename = json_file.name
 
         # Open CSV file for writing
-        with open(csv_filename, "w", newline="", encoding="utf-8") as csvfile:
-            writer = csv.DictWriter(csvfile, fieldnames=headers)
-            writer.writeheader()
-
-            # Process each auction and its lots
-            total_lots = 0
-            for auction in auctions_data:
-                auction_base = {field: auction.get(field, "") for field in auction_fields}
-                for lot in auction.get("lots", []):
-                    lot_data = {field: lot.get(field, "") for field in lot_fields}
-                    # Combine auction-level and lot-level data
-                    row = {**auction_base, **lot_data}
-                    writer.writerow(row)
-                    total_lots += 1
-
-        logging.info(f"Converted JSON to CSV successfully. Saved {total_lots} lots from {len(auctions_data)} auctions to {csv_filename}")
+        with json_file, contextlib.ExitStack() as stack:
+            json_lines = is_json_lines(json_file)
+            # Without an explicit chunksize, small inputs are written in one batch and larger ones in 10000-row chunks
+            if chunksize is None:
+                if engine == "python" and os.fstat(json_file.fileno()).st_size <= _SINGLE_WRITE_MAX_BYTES:
+                    chunksize = sys.maxsize
+                else:
+                    chunksize = 10000
+
+            if engine == "pyarrow":
+                # Each chunk is transposed to columns and formatted by Arrow's C++ writer, which
+                # quotes every string, so only the quoting differs from the python engine's output
+                schema = csv_schema()
+                options = pa_csv.WriteOptions(quoting_style="needed", eol="\r\n")
+                # Arrow compresses .zst and .gz output itself, in C++
+                codec = arrow_compression(csv_filename)
+                sink = stack.enter_context(pa.CompressedOutputStream(csv_filename, codec)) if codec else csv_filename
+                arrow_writer = stack.enter_context(pa_csv.CSVWriter(sink, schema, write_options=options))
+                write_batch = lambda batch: arrow_writer.write_table(rows_to_table(batch, schema))
+            else:
+                # Rows are escaped and joined by hand, skipping the csv module's per-row dispatch
+                csvfile = stack.enter_context(open_csv_output(csv_filename))
+                csvfile.write(format_csv_rows([CSV_HEADERS]))
+                write_batch = lambda batch: csvfile.write(format_csv_rows(batch))
+
+            if workers > 1 and engine == "python" and json_lines:
+                # Each worker converts a line-aligned byte range to a part file; parts are appended in order
+                ranges = json_lines_ranges(json_filename, workers)
+                part_filenames = [f"{csv_filename}.part{i}" for i in range(len(ranges))]
+                try:
+                    with multiprocessing.Pool(workers) as pool:
+                        counts = pool.starmap(write_csv_part, [
+                            (json_filename, start, end, part_filename, chunksize)
+                            for (start, end), part_filename in zip(ranges, part_filenames)
+                        ])
+                    for part_filename in part_filenames:
+                        with open(part_filename, "r", newline="", encoding="utf-8") as part:
+                            shutil.copyfileobj(part, csvfile, _IO_BUFFER_SIZE)
+                finally:
+                    for part_filename in part_filenames:
+                        if os.path.exists(part_filename):
+                            os.remove(part_filename)
+                total_auctions = sum(auctions for auctions, _ in counts)
+                total_lots = sum(lots for _, lots in counts)
+            else:
+                total_auctions, total_lots = write_auctions(iter_auctions(json_file), write_batch, chunksize)
+
+        logging.info(f"Converted JSON to CSV successfully. Saved {total_lots} lots from {total_auctions} auctions in {json_filename} to {csv_filename}")
 
     except Exception as e:
         logging.error(f"Error converting JSON to CSV: {str(e)}")
 
+def parse_year(value):
+    """Returns a scraped year as an int, or None if it is not a number."""
+    return int(value) if isinstance(value, str) and value.isdigit() else None
+
+def parse_price(value):
+    """Returns the amount in a scraped price string as a float, or None if it has no number."""
+    match = _PRICE_NUMBER_RE.search(value) if isinstance(value, str) else None
+    return float(match.group().replace(",", "")) if match else None
+
+def json_to_parquet(json_filename="auctions_with_lots.jsonl", parquet_filename="auctions_with_lots.parquet", row_group_size=65536, lots_as_lists=False):
+    """Converts the scraped auctions to a zstd-compressed Parquet file with one row per lot, or one row per auction with lots_as_lists."""
+    if pa is None:
+        logging.error("pyarrow is required to write Parquet output.")
+        return
+
+    try:
+        json_file = open_json(json_filename)
+        if json_file is None:
+            return
+        json_filename = json_file.name
+
+        # Lot fields are prefixed with "lot." so they cannot clash with auction fields; year and
+        # price are stored as numbers, and Parquet dictionary-encodes the repeated strings
+        lot_types = {field: pa.float64() if field == "price" else pa.string() for field in LOT_FIELDS}
+        if lots_as_lists:
+            # Each lot field becomes a list column with one entry per lot, so auction fields are stored once per auction
+            lot_types = {field: pa.list_(lot_type) for field, lot_type in lot_types.items()}
+        schema = pa.schema(
+            [(field, pa.int32() if field == "year" else pa.string()) for field in AUCTION_FIELDS]
+            + [(f"lot.{field}", lot_types[field]) for field in LOT_FIELDS]
+        )
+
+        total_auctions = 0
+        total_lots = 0
+        batch = []
+        batch_lots = 0
+        with json_file, pq.ParquetWriter(parquet_filename, schema, compression="zstd") as writer:
+            for auction in iter_auctions(json_file):
+                total_auctions += 1
+                lots = auction.get("lots") or []
+                # Auctions without lots have no rows per lot, but still get a row with empty lists per auction
+                if not lots and not lots_as_lists:
+                    continue
+
+                total_lots += len(lots)
+                batch_lots += len(lots)
+                auction_row = {field: auction.get(field) for field in AUCTION_FIELDS}
+                auction_row["year"] = parse_year(auction_row["year"])
+                if lots_as_lists:
+                    for field in LOT_FIELDS:
+                        auction_row[f"lot.{field}"] = [lot.get(field) for lot in lots]
+                    auction_row["lot.price"] = [parse_price(price) for price in auction_row["lot.price"]]
+                    batch.append(auction_row)
+                else:
+                    for lot in lots:
+                        row = {**auction_row, **{f"lot.{field}": lot.get(field) for field in LOT_FIELDS}}
+                        row["lot.price"] = parse_price(row["lot.price"])
+                        batch.append(row)
+
+                # Each batch of row_group_size lots becomes one row group, bounding memory on large
+                # inputs; in the list layout the group ends at the auction that fills it
+                if batch_lots >= row_group_size:
+                    writer.write_table(pa.Table.from_pylist(batch, schema=schema))
+                    batch.clear()
+                    batch_lots = 0
+
+            if batch:
+                writer.write_table(pa.Table.from_pylist(batch, schema=schema))
+
+        logging.info(f"Converted JSON to Parquet successfully. Saved {total_lots} lots from {total_auctions} auctions in {json_filename} to {parquet_filename}")
+
+    except Exception as e:
+        logging.error(f"Error converting JSON to Parquet: {str(e)}")
+
 if __name__ == "__main__":
-    json_to_csv()  # Uses default filenames: auctions_with_lots.json -> auctions_with_lots.csv
\ No newline at end of file
+    json_to_csv()  # Uses default filenames: auctions_with_lots.jsonl (or the legacy auctions_with_lots.json) -> auctions_with_lots.csv
\ No newline at end of file
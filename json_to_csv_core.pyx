@@ -0,0 +1,31 @@
+# cython: language_level=3, boundscheck=False, wraparound=False
+"""Compiled CSV row formatting for json_to_csv; build it in place with `cythonize -i -3 json_to_csv_core.pyx`."""
+
+cdef inline str escape_csv_value(object value):
+    """Returns a value as CSV text, quoted only when it contains a comma, quote or line break."""
+    cdef str text
+    cdef Py_UCS4 c
+    if value is None:
+        return ""
+    text = value if type(value) is str else str(value)
+    # One C loop over the characters stands in for the four substring tests in json_to_csv.escape_csv_value
+    for c in text:
+        if c == u'"' or c == u',' or c == u'\r' or c == u'\n':
+            return '"' + text.replace('"', '""') + '"'
+    return text
+
+cpdef str format_csv_rows(rows):
+    """Formats rows as CSV lines ending in CRLF, like the csv module's default dialect."""
+    cdef list parts = []
+    cdef object row
+    cdef object value
+    cdef bint first
+    for row in rows:
+        first = True
+        for value in row:
+            if not first:
+                parts.append(",")
+            parts.append(escape_csv_value(value))
+            first = False
+        parts.append("\r\n")
+    return "".join(parts)